@@ -0,0 +1,363 @@
+import io
+import os
+import sys
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+try:
+    # Private C kernel behind scipy.signal.find_peaks; used by the no-numba
+    # fallback to skip the wrapper's per-call validation and allocations
+    from scipy.signal._peak_finding_utils import _local_maxima_1d
+except ImportError:
+    _local_maxima_1d = None
+import matplotlib
+# Headless/batch runs (no display server) skip the GUI backend entirely
+if sys.platform != "win32" and os.environ.get("DISPLAY") is None:
+    matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+# Cheaper curve rendering for long sweeps
+plt.rcParams["path.simplify"] = True
+plt.rcParams["path.simplify_threshold"] = 1.0
+from scipy import signal
+try:
+    from numba import njit, types
+except ImportError:
+    njit = None
+
+# Mode constants of the waveguide under test (effective indices from simulation).
+N_EFF_TE = 3.087435
+N_EFF_TM = 3.073054
+
+# Facet reflectivities (Fresnel, normal incidence) for each mode.
+R_TE = ((N_EFF_TE - 1) / (N_EFF_TE + 1)) ** 2
+R_TM = ((N_EFF_TM - 1) / (N_EFF_TM + 1)) ** 2
+
+# Cavity-length factor 1e-11 / (2 * n_eff), folded once per mode so
+# calculate_loss only multiplies by it.
+TE_C = 1e-11 / (2.0 * N_EFF_TE)
+TM_C = 1e-11 / (2.0 * N_EFF_TM)
+
+# Minimum spacing between two Fabry-Perot fringes, in nm.
+PEAK_DIST_NM = 0.1
+
+# 🔧 Folder containing the <timestamp>_losses_TE / _TM / _raw scans (update accordingly)
+BASE_FOLDER = r"C:\Users\tperson\Desktop\loss_measurment\measurment_result"
+
+
+def read_data(filepath):
+    """
+    Reads a data.txt file written by the scan GUI (header line then two
+    whitespace-separated columns). The file is memory-mapped so the parsers
+    read straight from the page cache without an intermediate copy. Parsing
+    is done by pandas' C engine, which is much faster than a Python
+    line-by-line loop on large sweeps; without pandas installed, np.loadtxt
+    (also a C parser) is used instead.
+    filepath: str - Full path to the data.txt file
+    return: (ndarray, ndarray) - wavelengths (nm) and powers (mW)
+    """
+    with open(filepath, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header_end = mm.find(b"\n") + 1
+            mm.seek(header_end)  # skip the header line
+            if pd is not None:
+                df = pd.read_csv(mm, sep=r"\s+", header=None,
+                                 usecols=[0, 1], names=["wl", "p"],
+                                 dtype=np.float64, engine="c",
+                                 on_bad_lines="skip")
+                return df["wl"].to_numpy(), df["p"].to_numpy()
+            raw = mm[header_end:]
+            # Bulk-tokenize the whole buffer at C level (bytes.split plus a
+            # single array conversion) rather than iterating line by line
+            try:
+                arr = np.array(raw.split(), dtype=np.float64).reshape(-1, 2)
+                return arr[:, 0].copy(), arr[:, 1].copy()
+            except ValueError:
+                pass  # ragged or non-numeric lines: use the tolerant parsers
+            # loadtxt/genfromtxt iterate their input line by line, which an
+            # mmap does not support directly, so hand them a BytesIO view
+            buf = io.BytesIO(raw)
+            try:
+                wl, p = np.loadtxt(buf, usecols=(0, 1),
+                                   dtype=np.float64, unpack=True)
+            except ValueError:
+                # loadtxt refuses malformed lines; genfromtxt can skip them instead
+                buf.seek(0)
+                wl, p = np.genfromtxt(buf, usecols=(0, 1), dtype=np.float64,
+                                      invalid_raise=False, unpack=True)
+            return wl, p
+        finally:
+            mm.close()
+
+
+def load_cached(filepath):
+    """
+    Same contract as read_data, but keeps a sidecar .npz next to the text
+    file: when the cache is newer than data.txt it is np.load'ed directly
+    (memcpy-speed) instead of re-parsing the text on every run.
+    filepath: str - Full path to the data.txt file
+    return: (ndarray, ndarray) - wavelengths (nm) and powers (mW)
+    """
+    cache_path = filepath + ".npz"
+    try:
+        if os.path.getmtime(cache_path) >= os.path.getmtime(filepath):
+            cached = np.load(cache_path)
+            return cached["wl"], cached["p"]
+    except OSError:
+        pass
+    wl, p = read_data(filepath)
+    try:
+        np.savez(cache_path, wl=wl, p=p)
+    except OSError:
+        pass  # cache is best effort, re-parse next run
+    return wl, p
+
+
+def read_three(paths):
+    """
+    Parses the three data.txt files of a measurement set concurrently:
+    the pandas/NumPy C parsers release the GIL, so the file reads and the
+    tokenization of the three scans overlap.
+    paths: tuple of str - Paths to the TE, TM and RAW data.txt files
+    return: list of (ndarray, ndarray) - One (wl, power) pair per file
+    """
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        return list(executor.map(load_cached, paths))
+
+
+if njit is not None:
+    # Eager signatures: codegen happens once at import and is persisted by
+    # the on-disk cache, so later runs skip the first-call JIT pause.
+    # nogil lets other threads run while a kernel executes. Arrays are
+    # declared readonly so views coming out of pandas are accepted as-is.
+    _F8_RO = types.Array(types.float64, 1, "C", readonly=True)
+    _I8_RO = types.Array(types.int64, 1, "C", readonly=True)
+
+    @njit(types.Tuple((types.int64[:], types.int64[:]))(_F8_RO, types.int64),
+          cache=True, nogil=True, fastmath=True)
+    def find_extrema(y, min_dist):
+        """
+        Single forward pass over y collecting local maxima and minima that
+        are at least min_dist samples apart (greedy accept). Compiled by
+        Numba, so the scan runs as native code instead of going through
+        scipy.signal's Python wrappers.
+        y: float64[:] - Signal values
+        min_dist: int - Minimum index spacing between accepted extrema
+        return: (int64[:], int64[:]) - Indices of the maxima and of the minima
+        """
+        n = y.shape[0]
+        ind_max = np.empty(n, dtype=np.int64)
+        ind_min = np.empty(n, dtype=np.int64)
+        n_max = 0
+        n_min = 0
+        last_max = -min_dist
+        last_min = -min_dist
+        for i in range(1, n - 1):
+            if y[i - 1] < y[i] >= y[i + 1]:
+                if i - last_max >= min_dist:
+                    ind_max[n_max] = i
+                    n_max += 1
+                    last_max = i
+            elif y[i - 1] > y[i] <= y[i + 1]:
+                if i - last_min >= min_dist:
+                    ind_min[n_min] = i
+                    n_min += 1
+                    last_min = i
+        return ind_max[:n_max].copy(), ind_min[:n_min].copy()
+else:
+    find_extrema = None
+
+
+def _enforce_distance(ind, min_dist):
+    """
+    Greedy left-to-right minimum-spacing filter over sorted extrema
+    indices, matching the accept rule of the Numba kernel.
+    ind: ndarray - Candidate extrema indices, ascending
+    min_dist: int - Minimum index spacing between accepted extrema
+    return: ndarray - Filtered indices
+    """
+    if min_dist <= 1 or ind.size == 0:
+        return ind
+    keep = np.empty(ind.size, dtype=np.int64)
+    n = 0
+    last = -min_dist
+    for i in ind:
+        if i - last >= min_dist:
+            keep[n] = i
+            n += 1
+            last = i
+    return keep[:n]
+
+
+def find_peaks(power, distance_pts):
+    """
+    Finds the Fabry-Perot fringe extrema of a spectrum. Uses the Numba
+    kernel when available, otherwise scipy's C maxima scan. The minimum
+    fringe spacing is taken in samples: since the three scans share one
+    wavelength axis it is converted from nm once per run.
+    power: ndarray - Transmission values
+    distance_pts: int - Minimum index spacing between two fringes
+    return: (ndarray, ndarray) - Indices of the maxima and of the minima
+    """
+    if find_extrema is not None:
+        return find_extrema(np.ascontiguousarray(power, dtype=np.float64),
+                            distance_pts)
+    if _local_maxima_1d is not None:
+        power = np.ascontiguousarray(power, dtype=np.float64)
+        maxima, _, _ = _local_maxima_1d(power)
+        minima, _, _ = _local_maxima_1d(-power)
+        return (_enforce_distance(maxima, distance_pts),
+                _enforce_distance(minima, distance_pts))
+    ind_max, _ = signal.find_peaks(power, distance=distance_pts)
+    ind_min, _ = signal.find_peaks(-power, distance=distance_pts)
+    return ind_max, ind_min
+
+
+if njit is not None:
+    @njit(types.float64(_F8_RO, _F8_RO, _I8_RO, _I8_RO, types.float64, types.float64),
+          cache=True, nogil=True, fastmath=True)
+    def _loss_kernel(wl, power, ind_max, ind_min, R, mode_c):
+        # Explicit accumulation loops instead of np.mean on fancy-indexed
+        # views: Numba turns these into straight native loops
+        sum_max = 0.0
+        for i in range(ind_max.shape[0]):
+            sum_max += power[ind_max[i]]
+        mean_max = sum_max / ind_max.shape[0]
+        sum_min = 0.0
+        for i in range(ind_min.shape[0]):
+            sum_min += power[ind_min[i]]
+        mean_min = sum_min / ind_min.shape[0]
+
+        K = (mean_max - mean_min) / (mean_max + mean_min)
+        R_tilde = (1.0 - np.sqrt(1.0 - K * K)) / K
+
+        # Cavity length (cm) from the free spectral range of the first two fringes
+        loc0 = wl[ind_max[0]]
+        loc1 = wl[ind_max[1]]
+        L_meas = loc0 * loc0 / (loc1 - loc0) * mode_c
+
+        return 10.0 * np.log(R / R_tilde) / (np.log(10.0) * L_meas)
+else:
+    _loss_kernel = None
+
+# Scratch buffer reused by the NumPy fallback of calculate_loss, so the
+# extrema gathers do not allocate a fresh array per call (grown on demand)
+_SCRATCH = np.empty(4096, dtype=np.float64)
+
+
+def calculate_loss(wl, power, ind_max, ind_min, R, mode_c):
+    """
+    Fabry-Perot contrast method: fringe contrast K -> effective mirror
+    reflectivity R_tilde -> propagation loss in dB/cm. The whole
+    computation runs in a single Numba kernel when available.
+    wl: ndarray - Wavelength axis (nm)
+    power: ndarray - Normalized transmission
+    ind_max, ind_min: ndarray - Fringe extrema indices from find_peaks
+    R: float - Facet reflectivity of the mode
+    mode_c: float - Precomputed cavity-length factor (TE_C or TM_C)
+    return: float - Propagation loss (dB/cm)
+    """
+    if _loss_kernel is not None:
+        return _loss_kernel(np.ascontiguousarray(wl, dtype=np.float64),
+                            np.ascontiguousarray(power, dtype=np.float64),
+                            np.asarray(ind_max, dtype=np.int64),
+                            np.asarray(ind_min, dtype=np.int64),
+                            R, mode_c)
+
+    global _SCRATCH
+    need = max(ind_max.size, ind_min.size)
+    if need > _SCRATCH.size:
+        _SCRATCH = np.empty(need, dtype=np.float64)
+    np.take(power, ind_max, out=_SCRATCH[:ind_max.size])
+    mean_max = _SCRATCH[:ind_max.size].mean()
+    np.take(power, ind_min, out=_SCRATCH[:ind_min.size])
+    mean_min = _SCRATCH[:ind_min.size].mean()
+
+    K = (mean_max - mean_min) / (mean_max + mean_min)
+    R_tilde = (1.0 - np.sqrt(1.0 - K * K)) / K
+
+    # Cavity length (cm) from the free spectral range of the first two fringes
+    loc0 = wl[ind_max[0]]
+    loc1 = wl[ind_max[1]]
+    L_meas = loc0 ** 2 / (loc1 - loc0) * mode_c
+
+    return 10.0 * np.log(R / R_tilde) / (np.log(10.0) * L_meas)
+
+
+def main():
+    # Locate the three measurement folders produced by the scan GUI.
+    # os.scandir yields entries with their paths in one directory pass.
+    folders = {"losses_TE": None, "losses_TM": None, "losses_raw": None}
+    for entry in os.scandir(BASE_FOLDER):
+        for suffix in folders:
+            if entry.name.endswith(suffix):
+                folders[suffix] = entry.path
+                break
+    if None in folders.values():
+        raise FileNotFoundError("Missing one of the losses_TE / losses_TM / losses_raw folders.")
+    te_folder = folders["losses_TE"]
+    tm_folder = folders["losses_TM"]
+    raw_folder = folders["losses_raw"]
+
+    (wl_te, power_te), (wl_tm, power_tm), (wl_raw, power_raw) = read_three(
+        (os.path.join(te_folder, "data.txt"),
+         os.path.join(tm_folder, "data.txt"),
+         os.path.join(raw_folder, "data.txt")))
+
+    # The three scans must share the same wavelength axis. The GUI writes
+    # the axis identically in all three files, so an exact bytewise compare
+    # (a memcmp) is enough - no need for two ulp-tolerant allclose passes.
+    raw_axis = wl_raw.tobytes()
+    if (wl_te.shape != wl_raw.shape or wl_tm.shape != wl_raw.shape
+            or wl_te.tobytes() != raw_axis or wl_tm.tobytes() != raw_axis):
+        raise ValueError("Wavelength axes of the three scans do not match.")
+
+    # Normalize both polarizations by the raw (straight waveguide)
+    # transmission. TE/TM/RAW are stacked column-wise so one reciprocal
+    # pass over RAW scales both modes in place, and the ratios are views
+    # into the stacked matrix rather than fresh arrays.
+    P = np.column_stack((power_te, power_tm, power_raw))
+    inv = np.zeros(P.shape[0], dtype=np.float64)
+    np.reciprocal(P[:, 2], where=P[:, 2] != 0, out=inv)
+    P[:, 0] *= inv
+    P[:, 1] *= inv
+    ratio_te = P[:, 0]
+    ratio_tm = P[:, 1]
+
+    # The wavelength axis is common to the three scans: convert the fringe
+    # spacing to sample points once instead of per find_peaks call
+    dist_pts = max(1, int(round(PEAK_DIST_NM / (wl_raw[1] - wl_raw[0]))))
+
+    ind_max_te, ind_min_te = find_peaks(ratio_te, dist_pts)
+    ind_max_tm, ind_min_tm = find_peaks(ratio_tm, dist_pts)
+
+    loss_te = calculate_loss(wl_raw, ratio_te, ind_max_te, ind_min_te, R_TE, TE_C)
+    loss_tm = calculate_loss(wl_raw, ratio_tm, ind_max_tm, ind_min_tm, R_TM, TM_C)
+
+    print(f"TE propagation loss : {loss_te:.3f} dB/cm")
+    print(f"TM propagation loss : {loss_tm:.3f} dB/cm")
+
+    # Decimate the displayed curves: beyond ~20k points the extra samples
+    # only slow the renderer down without being visible
+    stride = max(1, wl_raw.size // 20000)
+
+    plt.figure(figsize=(10, 6))
+    plt.plot(wl_raw[::stride], ratio_te[::stride], label="TE / RAW")
+    plt.plot(wl_raw[::stride], ratio_tm[::stride], label="TM / RAW")
+    plt.plot(wl_raw[ind_max_te], ratio_te[ind_max_te], "x", color="tab:blue")
+    plt.plot(wl_raw[ind_max_tm], ratio_tm[ind_max_tm], "x", color="tab:orange")
+    plt.xlabel("Wavelength (nm)")
+    plt.ylabel("Normalized transmission")
+    plt.legend()
+    plt.savefig(os.path.join(BASE_FOLDER, "fp_result.png"), dpi=120)
+    if matplotlib.get_backend().lower() != "agg":
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
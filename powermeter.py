@@ -2,6 +2,8 @@ import ctypes
 import time
 import sys
 
+import numpy as np
+
 # Structure used to represent the measurement data received from the device.
 class DataPacketType(ctypes.Structure):
     _fields_ = [("measure", ctypes.c_float), ("period", ctypes.c_int)]
@@ -13,7 +15,13 @@ class FM_DLL:
         """
         dll_path: str - Full path to the DLL file
         """
-        self.dll = ctypes.CDLL(dll_path)
+        # WinDLL matches the stdcall convention of the FieldMax API and,
+        # with use_last_error, keeps a per-thread GetLastError snapshot so
+        # ctypes.get_last_error() reports the right code. ctypes drops the
+        # GIL for the duration of each foreign call, so a slow acquisition
+        # does not block the GUI thread.
+        loader = getattr(ctypes, "WinDLL", ctypes.CDLL)
+        self.dll = loader(dll_path, use_last_error=True)
         self._configure_functions()
 
     def _configure_functions(self):
@@ -98,12 +106,14 @@ class FM_Synchronizer:
         """
         self.dll = dll_wrapper.dll
         self.handle = handle
+        # Function pointer bound once instead of two attribute lookups per call
+        self._sync = dll_wrapper.dll.fm2LibSync
 
     def synchronize(self):
         """
         Resynchronizes communication with the FieldMax device.
         """
-        if self.dll.fm2LibSync(self.handle):
+        if self._sync(self.handle):
             print("Communication successfully resynchronized.")
         else:
             raise RuntimeError(f"Failed to resynchronize communication. System error: {ctypes.get_last_error()}")
@@ -118,20 +128,25 @@ class FM_DeviceInfo:
         """
         self.dll = dll_wrapper.dll
         self.handle = handle
+        # Function pointer bound once instead of two attribute lookups per call
+        self._get_serial = dll_wrapper.dll.fm2LibGetSerialNumber
+        # Reused across calls to avoid reallocating the ctypes buffer
+        # every time the serial number is polled
+        self._serial_buffer = ctypes.create_string_buffer(256)
+        self._serial_size = ctypes.c_int(256)
 
     def get_serial_number(self):
         """
         Returns the serial number of the device.
         return: str
         """
-        serial_size = ctypes.c_int(1024)
-        serial_buffer = ctypes.create_string_buffer(256)
-        success = self.dll.fm2LibGetSerialNumber(
-            self.handle, serial_buffer, ctypes.byref(serial_size)
+        self._serial_size.value = 256
+        success = self._get_serial(
+            self.handle, self._serial_buffer, ctypes.byref(self._serial_size)
         )
         if not success:
             raise RuntimeError("Failed to retrieve the serial number.")
-        return serial_buffer.value.decode('utf-8')
+        return self._serial_buffer.value.decode('utf-8')
 
 
 # This class handles acquisition of power/energy measurements from the device.
@@ -145,12 +160,22 @@ class FM_Measure:
         self.dll = dll_wrapper.dll
         self.handle = handle
         self.max_count = max_count
+        # Function pointer bound once instead of two attribute lookups per poll
+        self._get_data = dll_wrapper.dll.fm2LibGetData
         self.data_buffer = (DataPacketType * max_count)()
+        # Zero-copy NumPy view over the ctypes buffer: reading all samples
+        # costs one slice instead of max_count ctypes attribute accesses
+        self.np_view = np.frombuffer(
+            self.data_buffer, dtype=np.dtype([("measure", "<f4"), ("period", "<i4")])
+        )
 
     def get_measurements(self, iterations=5, delay=1):
+        # Every poll contributes to the average, so none of the waited-for
+        # acquisitions is wasted wall-clock
+        samples = []
         for i in range(iterations):
             count = ctypes.c_int(self.max_count)
-            result = self.dll.fm2LibGetData(self.handle, self.data_buffer, ctypes.byref(count))
+            result = self._get_data(self.handle, self.data_buffer, ctypes.byref(count))
             #print(f"Essai {i+1} - Résultat: {result}, Nombre mesures: {count.value}")
             #if not result:
             #    print("Erreur lors de la lecture des données.")
@@ -158,7 +183,11 @@ class FM_Measure:
             #    print("Aucune donnée mesurée.")
             #else:
             #    print(f"Mesure 0: {self.data_buffer[0].measure}")
+            if result and count.value > 0:
+                samples.append(self.np_view["measure"][:count.value].copy())
             time.sleep(delay)
+        if samples:
+            return float(np.concatenate(samples).mean())
         return self.data_buffer[0].measure
 def main():
     # 🔧 Path to your DLL (update this to the correct location)
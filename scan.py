@@ -1,12 +1,15 @@
 import sys
 import time
 from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QPushButton,
-                             QTextEdit, QHBoxLayout, QLabel, QLineEdit, QDialog,
-                             QFileDialog)
-from PyQt5.QtCore import QThread, pyqtSignal
+                             QPlainTextEdit, QHBoxLayout, QLabel, QLineEdit,
+                             QDialog, QFileDialog, QCheckBox)
+from PyQt5.QtCore import (QThread, QTimer, QObject, QRunnable, QThreadPool,
+                          pyqtSignal)
+import numpy as np
 import pyqtgraph as pg
 from PyQt5.QtGui import QFont, QColor, QPalette, QDoubleValidator
 import os
+from collections import deque
 from datetime import datetime
 import pyqtgraph.exporters
 from PyQt5.QtGui import QRegularExpressionValidator
@@ -17,6 +20,58 @@ from tunics_laser import TunicsLaser
 from powermeter import FM_DLL, FM_Communication, FM_Measure, FM_Synchronizer
 
 
+# Cheaper line rendering; OpenGL is only enabled when its binding exists
+pg.setConfigOptions(antialias=False)
+try:
+    import OpenGL  # noqa: F401
+    pg.setConfigOptions(useOpenGL=True)
+except ImportError:
+    pass
+
+# Compiled / parsed once at import instead of inside the GUI constructor
+FLOAT_REGEX = QRegularExpression(r"^-?\d{0,5}(\.\d{0,5})?$")  # accepte jusqu’à 5 chiffres + décimale
+
+START_BUTTON_STYLE = """
+    QPushButton {
+        background-color: #c62828;
+        color: white;
+        font-weight: bold;
+        padding: 8px 15px;
+        border-radius: 5px;
+    }
+    QPushButton:disabled {
+        background-color: #f5a9a9;
+        color: #888;
+    }
+    QPushButton:hover {
+        background-color: #b71c1c;
+    }
+"""
+STOP_BUTTON_STYLE = """
+    QPushButton {
+        background-color: #e53935;
+        color: white;
+        font-weight: bold;
+        padding: 8px 15px;
+        border-radius: 5px;
+    }
+    QPushButton:disabled {
+        background-color: #f5a9a9;
+        color: #888;
+    }
+    QPushButton:hover {
+        background-color: #b71c1c;
+    }
+"""
+LOG_CONSOLE_STYLE = "background-color: #f0f0f0; color: #101010; border: 1px solid #ccc;"
+
+# Early-exit convergence check: the scan stops once the last
+# FLAT_WINDOW samples span less than FLAT_EPS_MW and the loss dip has
+# already been passed, sparing the remainder of the sweep
+FLAT_WINDOW = 20
+FLAT_EPS_MW = 1e-3
+
+
 class SaveFolderDialog(QDialog):
     def __init__(self, current_path, parent=None):
         super().__init__(parent)
@@ -59,19 +114,45 @@ class SaveFolderDialog(QDialog):
         return self.path_edit.text()
 
 
+class ExportTask(QRunnable):
+    """
+    Writes an already-rendered plot image to disk on the global thread
+    pool, so the GUI does not freeze on the PNG encode/write. The scene
+    must be rendered on the GUI thread; only the file write runs here.
+    """
+
+    class Signals(QObject):
+        finished = pyqtSignal(str)
+
+    def __init__(self, image, path):
+        super().__init__()
+        self.image = image
+        self.path = path
+        self.signals = ExportTask.Signals()
+
+    def run(self):
+        self.image.save(self.path)
+        self.signals.finished.emit(self.path)
+
+
 class ScanThread(QThread):
-    new_data = pyqtSignal(float, float)
     log_signal = pyqtSignal(str)
     scan_finished = pyqtSignal()
 
-    def __init__(self, laser_resource, dll_path, wl_start, wl_stop, wl_step, delay):
+    def __init__(self, laser_resource, dll_path, wl_start, wl_stop, wl_step, delay,
+                 verbose=False):
         super().__init__()
+        # Produced samples; the GUI drains this from its plot timer, so no
+        # queued cross-thread signal is paid per sample (deque.append and
+        # popleft are atomic, no lock needed)
+        self.buf = deque(maxlen=4096)
         self.laser_resource = laser_resource
         self.dll_path = dll_path
         self.wl_start = wl_start
         self.wl_stop = wl_stop
         self.wl_step = wl_step
         self.delay = delay
+        self.verbose = verbose
         self._running = True
 
     def run(self):
@@ -90,17 +171,35 @@ class ScanThread(QThread):
 
             self.measure = FM_Measure(fm_dll, self.comm.handle)
 
-            wl = self.wl_start
-            while wl <= self.wl_stop and self._running:
-                self.laser.set_wavelength(wl)
-                time.sleep(self.delay)
-
-                self.measure.get_measurements(iterations=2, delay=0.5)
-                power = self.measure.data_buffer[0].measure
-                self.log_signal.emit(f"Wavelength: {wl:.3f} nm, Power: {power:.6f} W")
-                self.new_data.emit(wl, power)
+            # Precomputed sweep schedule: linspace hits the stop wavelength
+            # exactly, where repeated float += drifts and can miss it
+            n_pts = int(round((self.wl_stop - self.wl_start) / self.wl_step)) + 1
+            wavelengths = np.linspace(self.wl_start, self.wl_stop, n_pts)
 
-                wl += self.wl_step
+            for i, wl in enumerate(wavelengths):
+                if not self._running:
+                    break
+                wl = float(wl)
+                self.laser.set_wavelength(wl)
+                # Two single polls with interruptible waits in between (the
+                # first wait doubles as the laser settle time), so stop()
+                # takes effect within ~50 ms instead of after the whole
+                # measurement window
+                settle = max(self.delay, 0.5)
+                readings = []
+                for _ in range(2):
+                    if not self._wait(settle):
+                        break
+                    readings.append(
+                        self.measure.get_measurements(iterations=1, delay=0))
+                if not self._running:
+                    break
+                power = sum(readings) / len(readings)
+                # Per-sample formatting + emission is wasted work when the
+                # console scrolls it away: log every 10th point by default
+                if self.verbose or i % 10 == 0:
+                    self.log_signal.emit(f"Wavelength: {wl:.3f} nm, Power: {power:.6f} W")
+                self.buf.append((wl, power))
 
             self.log_signal.emit("Scan finished.")
 
@@ -124,6 +223,19 @@ class ScanThread(QThread):
 
             self.scan_finished.emit()
 
+    def _wait(self, seconds):
+        """
+        Sleeps in 50 ms slices, bailing out as soon as stop() is called.
+        Returns True when the full duration elapsed.
+        """
+        deadline = time.monotonic() + seconds
+        while self._running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            self.msleep(min(50, int(remaining * 1000) + 1))
+        return False
+
     def stop(self):
         self._running = False
 
@@ -151,6 +263,7 @@ class PowerScanGUI(QWidget):
         self.setPalette(palette)
 
         self.save_folder = r"C:\Users\tperson\Desktop\loss_measurment\measurment_result"
+        self._save_root_verified = False
 
         main_layout = QVBoxLayout()
         main_layout.setContentsMargins(15, 15, 15, 15)
@@ -159,8 +272,8 @@ class PowerScanGUI(QWidget):
         # Input fields layout
         input_layout = QHBoxLayout()
 
-        regex = QRegularExpression(r"^-?\d{0,5}(\.\d{0,5})?$")  # accepte jusqu’à 5 chiffres + décimale
-        float_validator = QRegularExpressionValidator(regex, self)
+        # One validator instance shared by the three inputs
+        float_validator = QRegularExpressionValidator(FLOAT_REGEX, self)
 
         self.label_start = QLabel("Start Wavelength (nm):")
         self.input_start = QLineEdit("1549.0")
@@ -180,6 +293,14 @@ class PowerScanGUI(QWidget):
         input_layout.addWidget(self.label_step)
         input_layout.addWidget(self.input_step)
 
+        self.verbose_checkbox = QCheckBox("Verbose log")
+        input_layout.addWidget(self.verbose_checkbox)
+
+        self.early_stop_checkbox = QCheckBox("Stop when flat")
+        self.early_stop_checkbox.setToolTip(
+            "End the scan once the power flattens out after the loss dip")
+        input_layout.addWidget(self.early_stop_checkbox)
+
         main_layout.addLayout(input_layout)
 
         self.plot_widget = pg.PlotWidget()
@@ -191,15 +312,32 @@ class PowerScanGUI(QWidget):
         self.plot_widget.getAxis('bottom').setTextPen(pg.mkPen('#101010'))
         self.plot_widget.getAxis('left').setTextPen(pg.mkPen('#101010'))
         self.plot_widget.showGrid(x=True, y=True, alpha=0.3)
-        self.curve = self.plot_widget.plot([], [], pen=pg.mkPen('r', width=2))
+        # Downsampling + view clipping keep the redraw cost proportional to
+        # visible pixels, not to the number of samples; the data is always
+        # finite so the finiteness scan can be skipped
+        self.curve = self.plot_widget.plot([], [], pen=pg.mkPen('r', width=2),
+                                           autoDownsample=True, clipToView=True,
+                                           skipFiniteCheck=True)
         main_layout.addWidget(self.plot_widget)
 
-        self.log_console = QTextEdit()
+        # QPlainTextEdit lays out per block (QTextEdit re-does rich-text
+        # layout on each append); the block count bounds the document so
+        # long scans cannot grow it without limit
+        self.log_console = QPlainTextEdit()
         self.log_console.setReadOnly(True)
+        self.log_console.setMaximumBlockCount(2000)
+        self.log_console.setUndoRedoEnabled(False)
         self.log_console.setFont(QFont('Consolas', 10))
-        self.log_console.setStyleSheet("background-color: #f0f0f0; color: #101010; border: 1px solid #ccc;")
+        self.log_console.setStyleSheet(LOG_CONSOLE_STYLE)
         main_layout.addWidget(self.log_console, 1)
 
+        # Log messages are queued and appended in one batch per tick
+        self._log_queue = []
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(100)
+        self.log_timer.timeout.connect(self._flush_log)
+        self.log_timer.start()
+
         self.choose_folder_button = QPushButton("Choose save folder")
         main_layout.addWidget(self.choose_folder_button)
         self.choose_folder_button.clicked.connect(self.open_save_folder_dialog)
@@ -208,38 +346,8 @@ class PowerScanGUI(QWidget):
         self.stop_button = QPushButton("Stop Scan")
         self.stop_button.setEnabled(False)
 
-        self.start_button.setStyleSheet("""
-            QPushButton {
-                background-color: #c62828;
-                color: white;
-                font-weight: bold;
-                padding: 8px 15px;
-                border-radius: 5px;
-            }
-            QPushButton:disabled {
-                background-color: #f5a9a9;
-                color: #888;
-            }
-            QPushButton:hover {
-                background-color: #b71c1c;
-            }
-        """)
-        self.stop_button.setStyleSheet("""
-            QPushButton {
-                background-color: #e53935;
-                color: white;
-                font-weight: bold;
-                padding: 8px 15px;
-                border-radius: 5px;
-            }
-            QPushButton:disabled {
-                background-color: #f5a9a9;
-                color: #888;
-            }
-            QPushButton:hover {
-                background-color: #b71c1c;
-            }
-        """)
+        self.start_button.setStyleSheet(START_BUTTON_STYLE)
+        self.stop_button.setStyleSheet(STOP_BUTTON_STYLE)
 
         main_layout.addWidget(self.start_button)
         main_layout.addWidget(self.stop_button)
@@ -249,8 +357,29 @@ class PowerScanGUI(QWidget):
         self.start_button.clicked.connect(self.start_scan)
         self.stop_button.clicked.connect(self.stop_scan)
 
-        self.data_x = []
-        self.data_y = []
+        # Preallocated sample arrays, filled index-wise during a scan;
+        # self.n is the number of valid samples. data_y holds raw watts:
+        # the mW scaling happens vectorized at display/save time
+        self.data_x = np.empty(0, dtype=np.float64)
+        self.data_y = np.empty(0, dtype=np.float64)
+        self.n = 0
+        self._dirty = False
+
+        # Redraws happen at a fixed ~20 Hz instead of once per sample
+        self.plot_timer = QTimer(self)
+        self.plot_timer.setInterval(50)
+        self.plot_timer.timeout.connect(self._flush_plot)
+
+        # Stamped once per scan; the run folder and every file path under
+        # it are derived from it a single time in _set_run_paths
+        self._run_stamp = None
+        self._run_folder = None
+
+        # Crash resilience on long scans: the data acquired so far is
+        # written to the run folder once a minute while scanning
+        self.checkpoint_timer = QTimer(self)
+        self.checkpoint_timer.setInterval(60000)
+        self.checkpoint_timer.timeout.connect(self._write_checkpoint)
 
         self.laser_resource = "ASRL4::INSTR"
         self.dll_path = r"C:\Program Files (x86)\Coherent\FieldMaxII PC\Drivers\Win10\FieldMax2Lib\x64\FieldMax2Lib.dll"
@@ -261,44 +390,135 @@ class PowerScanGUI(QWidget):
         dialog = SaveFolderDialog(self.save_folder, self)
         if dialog.exec_() == QDialog.Accepted:
             self.save_folder = dialog.get_path()
+            self._save_root_verified = False
             self.log(f"Save folder set to: {self.save_folder}")
 
     def save_data(self):
-        if not self.data_x or not self.data_y:
+        if self.n == 0:
             self.log("No data to save.")
             return
 
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        folder_name = f"{timestamp}_losses"
-        full_path = os.path.join(self.save_folder, folder_name)
+        # Paths are normally precomputed at start_scan; saving without a
+        # scan (should not happen) still gets a fresh stamp
+        if self._run_folder is None:
+            self._set_run_paths(datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
 
         try:
-            os.makedirs(full_path, exist_ok=True)
-            file_path = os.path.join(full_path, "data.txt")
-
-            with open(file_path, "w") as f:
-                f.write("Wavelength (nm)\tPower (mW)\n")
-                for wl, power in zip(self.data_x, self.data_y):
-                    f.write(f"{wl:.3f}\t{power:.6f}\n")
+            self._ensure_run_folder()
 
-            self.log(f"Data saved at : {file_path}")
+            self._write_table(self._data_path)
+            self.log(f"Data saved at : {self._data_path}")
         except Exception as e:
             self.log(f"Error while saving : {e}")
         
-        # Save plot as PNG
-        png_path = os.path.join(full_path, "plot.png")
-        exporter = pg.exporters.ImageExporter(self.plot_widget.plotItem)
-        exporter.parameters()['width'] = 800  # optional, size in pixels
-        exporter.export(png_path)
-        self.log(f"Graphique sauvegardé dans : {png_path}")
+        # Save the plot. Small scans go out as vector SVG (tiny file, no
+        # rasterization); dense scans rasterize wide enough to resolve the
+        # samples, rendered on the GUI thread and written in the pool.
+        if self.n < 500:
+            exporter = pg.exporters.SVGExporter(self.plot_widget.plotItem)
+            exporter.export(self._svg_path)
+            self.log(f"Graphique sauvegardé dans : {self._svg_path}")
+        else:
+            exporter = pg.exporters.ImageExporter(self.plot_widget.plotItem)
+            exporter.parameters()['width'] = max(800, min(3200, 4 * self.n))
+            image = exporter.export(toBytes=True)
+            task = ExportTask(image, self._png_path)
+            task.signals.finished.connect(
+                lambda path: self.log(f"Graphique sauvegardé dans : {path}"))
+            QThreadPool.globalInstance().start(task)
+
+    def _set_run_paths(self, stamp):
+        # Every save-time path derives from the stamp; one join for the
+        # run folder, plain concatenation (no per-call normalization) for
+        # the files beneath it
+        self._run_stamp = stamp
+        self._run_folder = os.path.join(self.save_folder, f"{stamp}_losses")
+        prefix = self._run_folder + os.sep
+        self._data_path = prefix + "data.txt"
+        self._partial_path = prefix + "partial.txt"
+        self._svg_path = prefix + "plot.svg"
+        self._png_path = prefix + "plot.png"
+
+    def _write_table(self, path):
+        # The whole table is formatted in one map() pass (no per-row
+        # interpreter loop as in np.savetxt) and flushed with a single
+        # buffered writelines instead of one write call per sample
+        mw = self.data_y[:self.n] * 1000.0  # W -> mW
+        lines = ["Wavelength (nm)\tPower (mW)\n"]
+        lines += map("%.3f\t%.6f\n".__mod__, zip(self.data_x[:self.n], mw))
+        with open(path, "w") as f:
+            f.writelines(lines)
+
+    def _ensure_run_folder(self):
+        # The root is only stat'ed/created once per chosen folder; the run
+        # subfolder may already exist when a checkpoint created it first
+        if not self._save_root_verified:
+            os.makedirs(self.save_folder, exist_ok=True)
+            self._save_root_verified = True
+        if not os.path.isdir(self._run_folder):
+            os.mkdir(self._run_folder)
+
+    def _write_checkpoint(self):
+        """
+        Writes the samples acquired so far to partial.txt in the run
+        folder, so a crash mid-scan loses at most a minute of data.
+        """
+        if self.n == 0:
+            return
+        try:
+            self._ensure_run_folder()
+            self._write_table(self._partial_path)
+        except Exception as e:
+            self.log(f"Error while writing checkpoint : {e}")
 
     def log(self, msg):
-        self.log_console.append(msg)
-
-    def update_plot(self, wl, power):
-        self.data_x.append(wl)
-        self.data_y.append(power * 1000)  # Convert W to mW
-        self.curve.setData(self.data_x, self.data_y)
+        self._log_queue.append(msg)
+
+    def _flush_log(self):
+        if self._log_queue:
+            self.log_console.appendPlainText('\n'.join(self._log_queue))
+            self._log_queue.clear()
+
+    def _flush_plot(self):
+        # Drain whatever the scan thread produced since the last tick and
+        # blit it into the arrays as one chunk (one vectorized assignment
+        # per tick instead of per-sample Python stores)
+        if self.thread is not None:
+            buf = self.thread.buf
+            n_new = len(buf)
+            if n_new:
+                chunk = np.array([buf.popleft() for _ in range(n_new)])
+                end = self.n + n_new
+                if end > self.data_x.size:
+                    self.data_x = np.resize(self.data_x, max(16, end, 2 * self.data_x.size))
+                    self.data_y = np.resize(self.data_y, self.data_x.size)
+                self.data_x[self.n:end] = chunk[:, 0]
+                self.data_y[self.n:end] = chunk[:, 1]  # raw watts
+                self.n = end
+                self._dirty = True
+                if self.early_stop_checkbox.isChecked():
+                    self._check_convergence()
+        if self._dirty:
+            # One SIMD multiply over the valid samples converts W to mW
+            self.curve.setData(self.data_x[:self.n], self.data_y[:self.n] * 1000.0)
+            self._dirty = False
+
+    def _check_convergence(self):
+        """
+        Stops the running scan once the trace has flattened out after the
+        loss dip: the last FLAT_WINDOW samples span less than FLAT_EPS_MW
+        and the minimum sits before that window. Points past the feature
+        carry no information, so skipping them costs nothing but time saved.
+        """
+        if self.n < 2 * FLAT_WINDOW:
+            return
+        tail = self.data_y[self.n - FLAT_WINDOW:self.n]
+        if np.ptp(tail) * 1000.0 >= FLAT_EPS_MW:
+            return
+        if np.argmin(self.data_y[:self.n]) < self.n - FLAT_WINDOW:
+            self.log(f"Power flat over last {FLAT_WINDOW} points after the "
+                     "minimum, ending scan early.")
+            self.thread.stop()
 
     def start_scan(self):
         try:
@@ -315,9 +535,13 @@ class PowerScanGUI(QWidget):
             self.log("Error: Invalid numeric input for wavelengths or step.")
             return
 
-        self.data_x.clear()
-        self.data_y.clear()
-        self.curve.clear()
+        # Size the sample arrays for the whole sweep up front
+        n_pts = int(round((wl_stop - wl_start) / wl_step)) + 1
+        self.data_x = np.empty(n_pts, dtype=np.float64)
+        self.data_y = np.empty(n_pts, dtype=np.float64)
+        self.n = 0
+        self._dirty = False
+        self.curve.setData([], [])  # reset the item, no full rebuild
 
         # 🔒 Fix axis range from start to stop
         self.plot_widget.setXRange(wl_start, wl_stop)
@@ -325,11 +549,14 @@ class PowerScanGUI(QWidget):
 
         delay = 0.5
 
-        self.thread = ScanThread(self.laser_resource, self.dll_path, wl_start, wl_stop, wl_step, delay)
-        self.thread.new_data.connect(self.update_plot)
+        self.thread = ScanThread(self.laser_resource, self.dll_path, wl_start, wl_stop, wl_step, delay,
+                                 verbose=self.verbose_checkbox.isChecked())
         self.thread.log_signal.connect(self.log)
         self.thread.scan_finished.connect(self.scan_finished)
+        self._set_run_paths(datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
         self.thread.start()
+        self.plot_timer.start()
+        self.checkpoint_timer.start()
 
         self.start_button.setEnabled(False)
         self.stop_button.setEnabled(True)
@@ -339,12 +566,18 @@ class PowerScanGUI(QWidget):
         if self.thread:
             self.thread.stop()
             self.thread.wait()  # Wait for the thread to finish cleanup
+            self.plot_timer.stop()
+            self.checkpoint_timer.stop()
+            self._flush_plot()  # Drain the last samples before dropping the thread
             self.thread = None
             self.log("Scan stopped.")
             self.start_button.setEnabled(True)
             self.stop_button.setEnabled(False)
 
     def scan_finished(self):
+        self.plot_timer.stop()
+        self.checkpoint_timer.stop()
+        self._flush_plot()
         self.log("Scan finished.")
         self.start_button.setEnabled(True)
         self.stop_button.setEnabled(False)
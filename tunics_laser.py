@@ -1,8 +1,18 @@
 import pyvisa
 
 class TunicsLaser:
+    # Shared VISA resource manager: the backend init (DLL load and bus
+    # enumeration) is paid once per process instead of per connection
+    _rm = None
+
+    @classmethod
+    def _get_rm(cls):
+        if cls._rm is None:
+            cls._rm = pyvisa.ResourceManager()
+        return cls._rm
+
     def __init__(self, resource_address):
-        self.rm = pyvisa.ResourceManager()
+        self.rm = TunicsLaser._get_rm()
         try:
             self.inst = self.rm.open_resource(resource_address)
             self.inst.write_termination = '\r'
@@ -52,23 +62,35 @@ class TunicsLaser:
         return self.inst.query("LIMIT?")
 
     # ---------- Wavelength / Frequency ----------
+
+    # Prebuilt framing for the tuning command, the hot path during sweeps
+    _WL_COMMAND = b"L=%.3f\r"
+
     def set_wavelength(self, wavelength_nm):
         """Set emission wavelength in nm."""
-        self.inst.write(f"L={wavelength_nm:.3f}")
+        # Format straight to bytes (terminator included) and use write_raw,
+        # skipping pyvisa's str encode and termination append per call
+        self.inst.write_raw(self._WL_COMMAND % wavelength_nm)
 
     def get_wavelength(self):
         """Query current emission wavelength."""
         return self.inst.query("L?")
 
+    def set_wavelength_and_enable(self, wavelength_nm):
+        """
+        Set the emission wavelength and enable the output in one compound
+        command: a single serial round-trip instead of two.
+        """
+        self.inst.write(f"L={wavelength_nm:.3f};ENABLE")
+
     # ---------- Utility ----------
     def identify(self):
         """Return the laser's ID string."""
         return self.inst.query("*IDN?")
 
     def close(self):
-        """Close the VISA resource."""
+        """Close the VISA resource (the shared manager stays open)."""
         self.inst.close()
-        self.rm.close()
 
 def main():
     resource_address = "ASRL4::INSTR"